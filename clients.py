@@ -1,18 +1,32 @@
-import psycopg2
+import argparse
+import logging
+import sys
+import psycopg
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import os
+import random
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from itertools import islice
+from urllib.parse import urlencode
 from dotenv import load_dotenv
-from typing import Optional, Dict, List
+from typing import Optional, Dict, Iterable, Iterator, List, Set, Tuple
+
+# orjson parses API responses faster; fall back to requests' stdlib decoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Debug: Print what was loaded (remove after testing)
-print(f"🔍 Debug Info:")
-print(f"   PG_HOST: {os.getenv('PG_HOST')}")
-print(f"   GOOGLE_API_KEY: {'Found' if os.getenv('GOOGLE_API_KEY') else 'NOT FOUND'}")
-print()
+logger = logging.getLogger(__name__)
 
 # --- Configuration loaded from .env ---
 
@@ -22,263 +36,742 @@ PG_CONFIG = {
     'port': os.getenv('PG_PORT'),
     'user': os.getenv('PG_USER'),
     'password': os.getenv('PG_PASSWORD'),
-    'database': os.getenv('PG_DATABASE')
+    'dbname': os.getenv('PG_DATABASE')
 }
 
 # Google Geocoding API key
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 GEOCODING_URL = 'https://maps.googleapis.com/maps/api/geocode/json'
 
+# The API key never changes, so its query-string fragment is encoded once
+GEOCODING_KEY_PARAM = urlencode({'key': GOOGLE_API_KEY or ''})
+
+# Concurrency: number of parallel geocoding workers. At ~200ms per request,
+# 16 workers already exceed the API's QPS limit, so raising this mostly
+# helps when latency is high
+MAX_WORKERS = int(os.getenv('GEOCODE_WORKERS', '16'))
+
+# Upper bound on clients submitted but not yet consumed, keeps memory flat
+MAX_IN_FLIGHT = MAX_WORKERS * 4
+
+# Rows fetched per round-trip from the server-side clients cursor
+FETCH_BATCH_SIZE = 1000
+
+# Shared HTTP session so workers reuse pooled TCP/TLS connections
+SESSION = requests.Session()
+# (pool_maxsize matches the worker count so no keep-alive connection is discarded)
+SESSION.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS))
+
+# Rate limiting: Google Geocoding API allows 50 requests per second
+RATE_LIMIT_QPS = 50
+MAX_RETRIES = 5
+MAX_BACKOFF_SECONDS = 32
+
+# In-memory address -> geolocation cache, warmed from the geocode_cache table
+CACHE: Dict[str, Dict] = {}
+
+# In-run memo of non-retriable failures, so an address that can't be
+# geocoded is only sent to Google once per run; cleared by process_clients
+FAILED_LOOKUPS: Dict[str, Dict] = {}
+
+# Single-flight registry: at most one API call per cache key at a time,
+# concurrent callers for the same key wait on the first caller's Future
+IN_FLIGHT_REQUESTS: Dict[str, Future] = {}
+IN_FLIGHT_LOCK = threading.Lock()
+
+# Number of geolocation rows buffered before a bulk insert
+INSERT_BATCH_SIZE = 500
+
+# Larger batches used for backfills, which load rows through COPY
+BACKFILL_BATCH_SIZE = 50000
+
+# Executions after which psycopg switches a query to a server-side prepared statement
+PREPARE_THRESHOLD = 3
+
+# Connection pool bounds; the maximum lets every worker hold a connection
+# alongside the client stream reader and the batch writer
+POOL_MIN_SIZE = 4
+POOL_MAX_SIZE = MAX_WORKERS + 4
+
+# Geocoding API statuses worth retrying with backoff (along with HTTP 408,
+# 429, 5xx and network errors) versus statuses that will never succeed on retry
+TRANSIENT_ERRORS = {'OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'}
+PERMANENT_ERRORS = {'ZERO_RESULTS', 'INVALID_REQUEST', 'REQUEST_DENIED', 'NOT_FOUND'}
+RETRIABLE_HTTP_STATUSES = {408, 429}
+
+# REQUEST_DENIED reflects the API key rather than the address, so it is
+# never checkpointed as permanent and those clients stay eligible once the
+# key is fixed. Only the remaining permanent errors blacklist a client;
+# anything else that isn't retried in-run is checkpointed as failed_transient
+KEY_ERRORS = {'REQUEST_DENIED'}
+CHECKPOINT_PERMANENT_ERRORS = PERMANENT_ERRORS - KEY_ERRORS
+
+# Log formatting, built once instead of per client
+SEP = '=' * 80
+RULE = '─' * 80
+
 # ----------------------------------------
 
 
-def get_clients_without_geolocation(conn) -> List[Dict]:
-    """Fetch clients that don't have geolocation data"""
+class TokenBucket:
+    """Thread-safe token bucket used to pace requests to the Geocoding API"""
+    
+    def __init__(self, capacity: int, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                elapsed = now - self.last_refill
+                self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+                self.last_refill = now
+                
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                
+                wait = (1 - self.tokens) / self.refill_rate
+            
+            time.sleep(wait)
+
+
+RATE_LIMITER = TokenBucket(capacity=RATE_LIMIT_QPS, refill_rate=RATE_LIMIT_QPS)
+
+
+def get_backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Exponential backoff with jitter, honoring a Retry-After header if present"""
+    delay = min(2 ** attempt + random.random(), MAX_BACKOFF_SECONDS)
+    
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), MAX_BACKOFF_SECONDS))
+        except ValueError:
+            pass
+    
+    return delay
+
+
+def normalize_address(address: str, components: Optional[Dict[str, str]] = None) -> str:
+    """Normalize an address (and its component filters) so equivalent lookups share a cache key"""
+    parts = [address]
+    
+    for name, value in (components or {}).items():
+        if not value:
+            continue
+        value = str(value)
+        if name == 'postal_code':
+            # Collapse pincode spellings such as "560 001" and "560-001" into "560001"
+            value = re.sub(r'[^\w]+', '', value)
+        parts.append(value)
+    
+    normalized = re.sub(r'[^\w\s]', ' ', ' '.join(parts).lower())
+    return re.sub(r'\s+', ' ', normalized).strip()
+
+
+def ensure_cache_table(conn):
+    """Create the persistent geocode cache table if it doesn't exist"""
     query = """
-        WITH ct AS (
-            SELECT * FROM geolocation g WHERE type = 'client'
-        ),
-        main AS (
-            SELECT c.* FROM ct LEFT JOIN public.clients c ON c.id = ct.id
+        CREATE TABLE IF NOT EXISTS geocode_cache (
+            norm_addr TEXT PRIMARY KEY,
+            lat DOUBLE PRECISION,
+            lng DOUBLE PRECISION,
+            formatted_address TEXT,
+            place_id TEXT,
+            cached_at TIMESTAMPTZ DEFAULT now()
         )
-        SELECT c.id, c.client_name, c.address, c.pincode, c.state, c.city
-        FROM clients c
-        WHERE c.client_name IS NOT NULL 
-        AND c.id NOT IN (SELECT id FROM main WHERE id IS NOT NULL)
     """
     
     with conn.cursor() as cur:
         cur.execute(query)
-        columns = [desc[0] for desc in cur.description]
-        results = cur.fetchall()
-        return [dict(zip(columns, row)) for row in results]
+    conn.commit()
 
 
-def build_address_string(client: Dict) -> str:
-    """Build a complete address string from client data"""
+def ensure_progress_table(conn):
+    """Create the checkpoint table used to resume interrupted runs"""
+    query = """
+        CREATE TABLE IF NOT EXISTS geocode_progress (
+            client_id BIGINT PRIMARY KEY,
+            attempted_at TIMESTAMPTZ,
+            status TEXT,
+            error TEXT
+        )
+    """
+    
+    with conn.cursor() as cur:
+        cur.execute(query)
+    conn.commit()
+
+
+def record_progress(cur, progress: List[Tuple[int, str, Optional[str]]]):
+    """Upsert (client_id, status, error) checkpoints; the caller commits"""
+    query = """
+        INSERT INTO geocode_progress (client_id, attempted_at, status, error)
+        VALUES (%s, now(), %s, %s)
+        ON CONFLICT (client_id) DO UPDATE
+        SET attempted_at = EXCLUDED.attempted_at, status = EXCLUDED.status, error = EXCLUDED.error
+    """
+    
+    if progress:
+        cur.executemany(query, progress)
+
+
+def load_geocode_cache(conn) -> int:
+    """Load the persistent geocode cache into memory"""
+    query = """
+        SELECT norm_addr, lat, lng, formatted_address, place_id FROM geocode_cache
+    """
+    
+    with conn.cursor() as cur:
+        cur.execute(query)
+        for norm_addr, lat, lng, formatted_address, place_id in cur:
+            CACHE[norm_addr] = {
+                'latitude': lat,
+                'longitude': lng,
+                'formatted_address': formatted_address,
+                'place_id': place_id or ''
+            }
+    
+    return len(CACHE)
+
+
+def save_to_cache(conn, norm_addr: str, geo_data: Dict) -> bool:
+    """Persist a successful geocode to the geocode_cache table under its normalized address"""
+    try:
+        insert_query = """
+            INSERT INTO geocode_cache (norm_addr, lat, lng, formatted_address, place_id)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (norm_addr) DO NOTHING
+        """
+        
+        with conn.cursor() as cur:
+            cur.execute(insert_query, (
+                norm_addr,
+                geo_data['latitude'],
+                geo_data['longitude'],
+                geo_data['formatted_address'],
+                geo_data['place_id']
+            ))
+        conn.commit()
+        return True
+    
+    except Exception as e:
+        logger.error("  ❌ Cache write error: %s", e)
+        conn.rollback()
+        return False
+
+
+def create_pool() -> ConnectionPool:
+    """Create a connection pool shared by the reader, the batch writer and the geocoding workers"""
+    return ConnectionPool(
+        kwargs={**PG_CONFIG, 'prepare_threshold': PREPARE_THRESHOLD},
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        open=False
+    )
+
+
+def iter_clients_without_geolocation(pool: ConnectionPool) -> Iterator[Dict]:
+    """Stream clients that don't have geolocation data from a server-side cursor
+    
+    The cursor lives on its own pooled connection, so the writes made while
+    the stream is being consumed never end its transaction.
+    """
+    query = """
+        SELECT c.id, c.client_name, c.address, c.pincode, c.state, c.city
+        FROM clients c
+        WHERE c.client_name IS NOT NULL
+        AND NOT EXISTS (
+            SELECT 1 FROM geolocation g WHERE g.id = c.id AND g.type = 'client'
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM geocode_progress p
+            WHERE p.client_id = c.id AND p.status IN ('success', 'failed_permanent')
+        )
+    """
+    
+    with pool.connection() as conn:
+        with conn.cursor(name='clients_cur', row_factory=dict_row) as cur:
+            cur.itersize = FETCH_BATCH_SIZE
+            cur.execute(query)
+            yield from cur
+
+
+def build_address_string(client: Dict) -> Tuple[str, Dict[str, str]]:
+    """Build the free-text address line and Geocoding API component filters for a client
+    
+    Returns:
+        (address_line, components) where components maps Google component
+        names (country, postal_code, administrative_area, locality) to values
+    """
     address_parts = []
     
     if client.get('address'):
         address_parts.append(client['address'])
     if client.get('city'):
         address_parts.append(client['city'])
-    if client.get('state'):
-        address_parts.append(client['state'])
-    if client.get('pincode'):
-        address_parts.append(str(client['pincode']))
     
-    address_parts.append('India')
+    components = {
+        'country': 'IN',
+        'postal_code': str(client['pincode']) if client.get('pincode') else None,
+        'administrative_area': client.get('state'),
+        'locality': client.get('city')
+    }
     
-    return ', '.join(address_parts)
+    return ', '.join(address_parts), components
 
 
-def get_geolocation(address: str) -> Optional[Dict]:
-    """Fetch geolocation data from Google Geocoding API"""
-    try:
-        params = {
-            'address': address,
-            'key': GOOGLE_API_KEY
-        }
-        
-        response = requests.get(GEOCODING_URL, params=params, timeout=10)
-        response.raise_for_status()
+def get_geolocation(address: str, components: Dict[str, str],
+                    session: requests.Session = SESSION,
+                    norm_addr: Optional[str] = None) -> Optional[Dict]:
+    """Fetch geolocation data, sharing cached results and in-flight requests for the same address
+    
+    Callers that already hold the normalized address can pass it as norm_addr
+    to skip normalizing it again.
+    """
+    if norm_addr is None:
+        norm_addr = normalize_address(address, components)
+    
+    with IN_FLIGHT_LOCK:
+        cached = CACHE.get(norm_addr)
+        if cached:
+            return {**cached, 'cached': True}
         
-        data = response.json()
+        failed = FAILED_LOOKUPS.get(norm_addr)
+        if failed:
+            return failed
         
-        if data['status'] == 'OK' and data['results']:
-            location = data['results'][0]['geometry']['location']
-            formatted_address = data['results'][0]['formatted_address']
-            
-            return {
-                'latitude': location['lat'],
-                'longitude': location['lng'],
-                'formatted_address': formatted_address,
-                'place_id': data['results'][0].get('place_id', '')
-            }
-        else:
-            return {
-                'error': data.get('status', 'UNKNOWN'),
-                'message': data.get('error_message', 'No results found')
-            }
-            
-    except requests.exceptions.RequestException as e:
+        future = IN_FLIGHT_REQUESTS.get(norm_addr)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            IN_FLIGHT_REQUESTS[norm_addr] = future
+    
+    if not is_owner:
+        # Another thread is already geocoding this address; it also persists the result
+        result = future.result()
+        return {**result, 'cached': True} if 'latitude' in result else result
+    
+    try:
+        result = fetch_geolocation(address, components, session)
+        if 'latitude' in result:
+            CACHE[norm_addr] = result
+        elif not result.get('retriable'):
+            FAILED_LOOKUPS[norm_addr] = result
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with IN_FLIGHT_LOCK:
+            del IN_FLIGHT_REQUESTS[norm_addr]
+
+
+def parse_geocoding_response(response: requests.Response) -> Dict:
+    """Turn a single Geocoding API response into a result or a classified error"""
+    if response.status_code == 429:
+        return {'error': 'OVER_QUERY_LIMIT', 'message': 'HTTP 429', 'retriable': True}
+    if not response.ok:
         return {
             'error': 'API_REQUEST_FAILED',
-            'message': str(e)
+            'message': f'HTTP {response.status_code} {response.reason}',
+            'retriable': response.status_code in RETRIABLE_HTTP_STATUSES or response.status_code >= 500
         }
-    except Exception as e:
+    
+    data = orjson.loads(response.content) if orjson else response.json()
+    
+    if data['status'] == 'OK' and data['results']:
+        location = data['results'][0]['geometry']['location']
+        formatted_address = data['results'][0]['formatted_address']
+        
         return {
-            'error': 'UNEXPECTED_ERROR',
-            'message': str(e)
+            'latitude': location['lat'],
+            'longitude': location['lng'],
+            'formatted_address': formatted_address,
+            'place_id': data['results'][0].get('place_id', '')
         }
+    
+    status = data.get('status', 'UNKNOWN')
+    return {
+        'error': status,
+        'message': data.get('error_message', 'No results found'),
+        'retriable': status in TRANSIENT_ERRORS
+    }
+
+
+def fetch_geolocation(address: str, components: Dict[str, str],
+                      session: requests.Session = SESSION) -> Dict:
+    """Fetch geolocation data from Google Geocoding API
+    
+    Transient failures are retried with backoff. Errors are returned as
+    {'error', 'message', 'retriable'} so callers can tell a failure worth
+    retrying later from one that will never succeed.
+    """
+    # Structured components narrow the search server-side
+    components_str = '|'.join(f'{k}:{v}' for k, v in components.items() if v)
+    query = urlencode({'address': address, 'components': components_str})
+    url = f'{GEOCODING_URL}?{query}&{GEOCODING_KEY_PARAM}'
+    
+    for attempt in range(MAX_RETRIES):
+        RATE_LIMITER.acquire()
+        retry_after = None
+        
+        try:
+            response = session.get(url, timeout=10)
+            retry_after = response.headers.get('Retry-After')
+            result = parse_geocoding_response(response)
+        except requests.exceptions.RequestException as e:
+            result = {'error': 'API_REQUEST_FAILED', 'message': str(e), 'retriable': True}
+        except Exception as e:
+            # Malformed or unexpectedly shaped responses go through the same backoff
+            result = {'error': 'UNEXPECTED_ERROR', 'message': str(e), 'retriable': True}
+        
+        # Only transient failures are retried; permanent ones would just burn quota
+        if 'latitude' in result or not result['retriable'] or attempt == MAX_RETRIES - 1:
+            return result
+        
+        time.sleep(get_backoff_delay(attempt, retry_after))
 
 
-def save_geolocation(conn, client_id: int, geo_data: Dict) -> bool:
-    """Save geolocation data to the database only if it doesn't exist"""
+def ensure_geolocation_indexes(conn):
+    """Create the geolocation indexes used for ON CONFLICT inserts and client lookups"""
+    queries = [
+        "CREATE UNIQUE INDEX IF NOT EXISTS geolocation_id_type_uq ON geolocation (id, type)",
+        "CREATE INDEX IF NOT EXISTS geolocation_client_idx ON geolocation (id) WHERE type = 'client'"
+    ]
+    
+    with conn.cursor() as cur:
+        for query in queries:
+            cur.execute(query)
+    conn.commit()
+
+
+def save_geolocations(conn, rows: List[Tuple[int, float, float]],
+                      progress: List[Tuple[int, str, Optional[str]]] = ()) -> Optional[Set[int]]:
+    """Bulk insert (client_id, latitude, longitude) rows, skipping existing ones
+    
+    Progress checkpoints for the batch are committed in the same transaction.
+    
+    Returns:
+        IDs of the rows actually inserted, or None if the batch failed
+    """
     try:
-        # First check if the client already exists in geolocation table
-        check_query = """
-            SELECT id FROM geolocation WHERE id = %s AND type = 'client'
+        insert_query = """
+            INSERT INTO geolocation (id, latitude, longitude, type)
+            VALUES (%s, %s, %s, 'client')
+            ON CONFLICT (id, type) DO NOTHING
+            RETURNING id
+        """
+        
+        inserted = set()
+        
+        # Pipeline mode sends every INSERT back-to-back and reads the
+        # results in bulk instead of waiting a round-trip per row
+        with conn.pipeline(), conn.cursor() as cur:
+            if rows:
+                cur.executemany(insert_query, rows, returning=True)
+                while True:
+                    inserted.update(row[0] for row in cur.fetchall())
+                    if not cur.nextset():
+                        break
+            record_progress(cur, progress)
+        conn.commit()
+        logger.info("  ✅ Inserted %d/%d rows into geolocation table", len(inserted), len(rows))
+        return inserted
+    
+    except Exception as e:
+        logger.error("  ❌ Database error: %s", e)
+        conn.rollback()
+        return None
+
+
+def copy_geolocations(conn, rows: List[Tuple[int, float, float]],
+                      progress: List[Tuple[int, str, Optional[str]]] = ()) -> Optional[Set[int]]:
+    """Bulk load (client_id, latitude, longitude) rows via COPY, skipping existing ones
+    
+    Rows are streamed into a temporary staging table and merged with a single
+    INSERT ... ON CONFLICT, which is much faster than INSERT for large backfills.
+    Progress checkpoints for the batch are committed in the same transaction.
+    
+    Returns:
+        IDs of the rows actually inserted, or None if the batch failed
+    """
+    try:
+        staging_query = """
+            CREATE TEMP TABLE IF NOT EXISTS geolocation_staging (
+                id BIGINT,
+                latitude DOUBLE PRECISION,
+                longitude DOUBLE PRECISION
+            ) ON COMMIT DELETE ROWS
+        """
+        merge_query = """
+            INSERT INTO geolocation (id, latitude, longitude, type)
+            SELECT id, latitude, longitude, 'client' FROM geolocation_staging
+            ON CONFLICT (id, type) DO NOTHING
+            RETURNING id
         """
         
         with conn.cursor() as cur:
-            cur.execute(check_query, (client_id,))
-            existing = cur.fetchone()
-            
-            if existing:
-                print(f"  ⚠️  Client ID {client_id} already exists in geolocation table. Skipping insert.")
-                return False
+            cur.execute(staging_query)
+            with cur.copy("COPY geolocation_staging (id, latitude, longitude) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+            cur.execute(merge_query)
+            inserted = {row[0] for row in cur.fetchall()}
+            record_progress(cur, progress)
+        conn.commit()
+        logger.info("  ✅ Copied %d/%d rows into geolocation table", len(inserted), len(rows))
+        return inserted
+    
+    except Exception as e:
+        logger.error("  ❌ Database error: %s", e)
+        conn.rollback()
+        return None
+
+
+def geocode_client(pool: ConnectionPool, address: str, components: Dict[str, str],
+                   norm_addr: str) -> Dict:
+    """Geocode a single address, persisting fresh results with a pooled connection"""
+    geo_data = get_geolocation(address, components, SESSION, norm_addr)
+    
+    if geo_data and 'latitude' in geo_data and not geo_data.get('cached'):
+        with pool.connection() as conn:
+            save_to_cache(conn, norm_addr, geo_data)
+    
+    return geo_data
+
+
+def geocode_clients(pool: ConnectionPool, clients: Iterable[Dict]) -> Iterator[Tuple[Dict, str, Dict]]:
+    """Geocode clients concurrently, yielding (client, address, geo_data) as each completes
+    
+    Clients whose normalized address matches one already in flight are
+    attached to that request instead of triggering another API call. At most
+    MAX_IN_FLIGHT clients are pulled from the iterable ahead of the consumer,
+    so a streamed source is never fully materialized.
+    """
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        in_flight = {}  # future -> (cache key, (client, address) pairs sharing that key)
+        by_key = {}     # cache key -> future
+        waiting = 0
+        
+        def drain(futures):
+            nonlocal waiting
+            for future in futures:
+                key, group = in_flight.pop(future)
+                del by_key[key]
+                waiting -= len(group)
+                geo_data = future.result()
+                for client, address in group:
+                    yield client, address, geo_data
+        
+        for client in clients:
+            # Build and normalize the address once; workers reuse both
+            address, components = build_address_string(client)
+            key = normalize_address(address, components)
             
-            # Insert new geolocation record
-            insert_query = """
-                INSERT INTO geolocation (id, latitude, longitude, type)
-                VALUES (%s, %s, %s, 'client')
-            """
+            if key in by_key:
+                in_flight[by_key[key]][1].append((client, address))
+            else:
+                future = executor.submit(geocode_client, pool, address, components, key)
+                in_flight[future] = (key, [(client, address)])
+                by_key[key] = future
+            waiting += 1
             
-            cur.execute(insert_query, (
-                client_id,
-                geo_data['latitude'],
-                geo_data['longitude']
-            ))
-            conn.commit()
-            print(f"  ✅ Inserted into geolocation table")
-            return True
+            if waiting >= MAX_IN_FLIGHT:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from drain(done)
         
-    except Exception as e:
-        print(f"  ❌ Database error: {e}")
-        conn.rollback()
-        return False
+        yield from drain(as_completed(list(in_flight)))
 
 
-def process_clients(limit: int = None):
+def process_clients(limit: int = None, backfill: bool = False, collect_results: bool = False):
     """Main function to fetch and save geolocation for clients
     
     Args:
         limit: Number of clients to process (default: None for all clients)
+        backfill: Load rows with COPY in large batches, for initial backfills
+        collect_results: Keep a per-client result dict for the whole run. Off by
+            default so memory stays constant regardless of the number of clients
+    
+    Returns:
+        The per-client results if collect_results is set, otherwise a dict of
+        processed/success/skipped/failed counts
     """
     # Check if necessary config values are loaded
     if not all([PG_CONFIG['host'], GOOGLE_API_KEY]):
-        print("❌ Configuration Error: Database host or API key not loaded. Check your .env file.")
+        logger.error("❌ Configuration Error: Database host or API key not loaded. Check your .env file.")
         return
 
-    conn = None
+    pool = None
+    clients = None
     results = []
     
     try:
         # Connect to database
-        print("🔌 Connecting to database...")
-        conn = psycopg2.connect(**PG_CONFIG)
-        print("✅ Connected successfully\n")
+        logger.debug("🔍 PG_HOST: %s", PG_CONFIG['host'])
+        logger.info("🔌 Connecting to database...")
+        FAILED_LOOKUPS.clear()
+        pool = create_pool()
+        pool.open(wait=True)
+        logger.info("✅ Connected successfully")
         
-        # Fetch clients without geolocation
-        print("📋 Fetching clients without geolocation...")
-        all_clients = get_clients_without_geolocation(conn)
-        print(f"✅ Found {len(all_clients)} total clients")
+        with pool.connection() as conn:
+            ensure_geolocation_indexes(conn)
+            
+            # Warm the in-memory geocode cache from the database
+            ensure_progress_table(conn)
+            ensure_cache_table(conn)
+            logger.info("🗄️  Loaded %d cached addresses", load_geocode_cache(conn))
+        
+        # Stream clients without geolocation
+        logger.info("📋 Streaming clients without geolocation...")
+        clients = iter_clients_without_geolocation(pool)
         
         # Apply limit
+        to_process = clients
         if limit:
-            clients = all_clients[:limit]
-            print(f"🎯 Processing first {len(clients)} clients (limit applied)\n")
+            to_process = islice(clients, limit)
+            logger.info("🎯 Processing first %d clients (limit applied)", limit)
         else:
-            clients = all_clients
-            print(f"🎯 Processing ALL {len(clients)} clients\n")
-        
-        print("=" * 80)
+            logger.info("🎯 Processing ALL clients")
         
-        if not clients:
-            print("ℹ️  No clients to process. Exiting.")
-            return
+        logger.info(SEP)
         
         # Process each client
         success_count = 0
         failed_count = 0
         skipped_count = 0
+        pending = []
+        progress = []  # (client_id, status, error) checkpoint for every attempt
+        batch_size = BACKFILL_BATCH_SIZE if backfill else INSERT_BATCH_SIZE
+        save_batch = copy_geolocations if backfill else save_geolocations
+        
+        def record(result: Dict):
+            if collect_results:
+                results.append(result)
         
-        for idx, client in enumerate(clients, 1):
+        def flush_pending():
+            nonlocal success_count, failed_count, skipped_count
+            with pool.connection() as conn:
+                inserted = save_batch(conn, [
+                    (r['client_id'], r['latitude'], r['longitude']) for r in pending
+                ], progress)
+            
+            for row in pending:
+                if inserted is None:
+                    failed_count += 1
+                    record({**row, 'status': 'failed', 'error': 'DATABASE_ERROR'})
+                elif row['client_id'] in inserted:
+                    success_count += 1
+                    record({**row, 'status': 'success'})
+                else:
+                    skipped_count += 1
+                    record({**row, 'status': 'skipped', 'reason': 'Already exists in database'})
+            pending.clear()
+            progress.clear()
+        
+        # Geocode concurrently; workers write cache rows on their own pooled
+        # connections while geolocation rows are batched here
+        idx = 0
+        for idx, (client, address, geo_data) in enumerate(geocode_clients(pool, to_process), 1):
             client_id = client['id']
             client_name = client['client_name']
-            address = build_address_string(client)
-            
-            print(f"\n[{idx}/{len(clients)}] Client ID: {client_id}")
-            print(f"{'─' * 80}")
-            print(f"👤 Client Name: {client_name}")
-            print(f"📍 Address: {address}")
             
-            # Get geolocation
-            geo_data = get_geolocation(address)
+            logger.debug("\n[%d] Client ID: %s\n%s\n👤 Client Name: %s\n📍 Address: %s",
+                         idx, client_id, RULE, client_name, address)
             
             if geo_data and 'latitude' in geo_data:
-                print(f"✅ Geocoding SUCCESS")
-                print(f"   Latitude:  {geo_data['latitude']}")
-                print(f"   Longitude: {geo_data['longitude']}")
-                print(f"   Formatted: {geo_data['formatted_address']}")
-                
-                # Save to database
-                saved = save_geolocation(conn, client_id, geo_data)
-                
-                if saved:
-                    success_count += 1
-                    results.append({
-                        'client_id': client_id,
-                        'client_name': client_name,
-                        'status': 'success',
-                        'latitude': geo_data['latitude'],
-                        'longitude': geo_data['longitude'],
-                        'formatted_address': geo_data['formatted_address']
-                    })
-                else:
-                    skipped_count += 1
-                    results.append({
-                        'client_id': client_id,
-                        'client_name': client_name,
-                        'status': 'skipped',
-                        'reason': 'Already exists in database'
-                    })
+                logger.debug("✅ Geocoding SUCCESS%s\n   Latitude:  %s\n   Longitude: %s\n   Formatted: %s",
+                             " (served from cache)" if geo_data.get('cached') else "",
+                             geo_data['latitude'], geo_data['longitude'], geo_data['formatted_address'])
+            
+                # Buffer for the next bulk insert
+                pending.append({
+                    'client_id': client_id,
+                    'client_name': client_name,
+                    'latitude': geo_data['latitude'],
+                    'longitude': geo_data['longitude'],
+                    'formatted_address': geo_data['formatted_address']
+                })
+                progress.append((client_id, 'success', None))
             else:
-                print(f"❌ Geocoding FAILED")
-                print(f"   Error: {geo_data.get('error', 'Unknown')}")
-                print(f"   Message: {geo_data.get('message', 'N/A')}")
+                logger.debug("❌ Geocoding FAILED\n   Error: %s\n   Message: %s",
+                             geo_data.get('error', 'Unknown'), geo_data.get('message', 'N/A'))
                 failed_count += 1
-                
-                results.append({
+            
+                record({
                     'client_id': client_id,
                     'client_name': client_name,
                     'status': 'failed',
                     'error': geo_data.get('error', 'Unknown'),
                     'message': geo_data.get('message', 'N/A')
                 })
+                
+                error = geo_data.get('error', 'Unknown')
+                status = 'failed_permanent' if error in CHECKPOINT_PERMANENT_ERRORS else 'failed_transient'
+                progress.append((client_id, status, error))
             
-            # Rate limiting: Google API has limits, add delay between requests
-            if idx < len(clients):
-                time.sleep(0.2)  # 200ms delay between requests
+            # Every attempt is checkpointed, so flush on progress size
+            if len(progress) >= batch_size:
+                flush_pending()
+        
+        if progress:
+            flush_pending()
+        
+        if idx == 0:
+            logger.info("ℹ️  No clients to process. Exiting.")
+            return
         
         # Summary
-        print("\n" + "=" * 80)
-        print("📊 SUMMARY")
-        print("=" * 80)
-        print(f"Total clients processed: {len(clients)}")
-        print(f"✅ Successfully saved: {success_count}")
-        print(f"⏭️  Skipped (already exists): {skipped_count}")
-        print(f"❌ Failed: {failed_count}")
-        print("=" * 80)
+        logger.info("\n%s\n📊 SUMMARY\n%s", SEP, SEP)
+        logger.info("Total clients processed: %d", idx)
+        logger.info("✅ Successfully saved: %d", success_count)
+        logger.info("⏭️  Skipped (already exists): %d", skipped_count)
+        logger.info("❌ Failed: %d", failed_count)
+        logger.info(SEP)
         
-        return results
+        if collect_results:
+            return results
+        return {
+            'processed': idx,
+            'success': success_count,
+            'skipped': skipped_count,
+            'failed': failed_count
+        }
         
-    except psycopg2.Error as e:
-        print(f"❌ Database error: {e}")
+    except psycopg.Error as e:
+        logger.error("❌ Database error: %s", e)
     except Exception as e:
-        print(f"❌ Unexpected error: {e}")
+        logger.exception("❌ Unexpected error: %s", e)
     finally:
-        if conn:
-            conn.close()
-            print("\n🔌 Database connection closed")
+        if clients is not None:
+            clients.close()
+        if pool is not None:
+            pool.close()
+            logger.info("🔌 Database connection pool closed")
 
 
 if __name__ == "__main__":
-    # Process ALL clients
-    print("🚀 Starting Client Geocoding Script (Processing ALL clients)")
-    print("=" * 80)
-    results = process_clients()
+    parser = argparse.ArgumentParser(description="Geocode clients without geolocation data")
+    parser.add_argument('--limit', type=int, help="Number of clients to process (default: all)")
+    parser.add_argument('--backfill', action='store_true',
+                        help="Load rows with COPY in large batches, for initial backfills")
+    parser.add_argument('--quiet', action='store_true', help="Only log warnings and errors")
+    args = parser.parse_args()
+    
+    # Per-client details are logged at DEBUG; set LOG_LEVEL=DEBUG to see them
+    log_level = 'WARNING' if args.quiet else os.getenv('LOG_LEVEL', 'INFO').upper()
+    logging.basicConfig(level=log_level, format='%(message)s', stream=sys.stdout)
     
-    # To process limited number, change to:
-    # results = process_clients(limit=2)
\ No newline at end of file
+    if args.limit:
+        logger.info("🚀 Starting Client Geocoding Script (Processing %d clients)", args.limit)
+    else:
+        logger.info("🚀 Starting Client Geocoding Script (Processing ALL clients)")
+    logger.info(SEP)
+    results = process_clients(limit=args.limit, backfill=args.backfill)